@@ -1,11 +1,37 @@
 import streamlit as st
 import numpy as np
-from optimizer import Panel, optimize_layout
+from optimizer import Panel, StockSheet, from_units, optimize_layout, to_units, warm_up
 from visualizer import visualize_layout
 import time
 
 st.set_page_config(page_title="Panel Cut Optimizer", layout="wide")
 
+# Compile the placement kernel once per server process, not on the first click
+@st.cache_resource
+def warm_up_optimizer():
+    warm_up()
+
+warm_up_optimizer()
+
+# Reruns with unchanged inputs reuse earlier layouts. Layouts are cached by hand
+# in session state rather than with st.cache_data, whose element replay cannot
+# reach the progress placeholders the callback writes to
+def run_optimization(stock_width, stock_height, panel_specs, progress_callback=None):
+    cache = st.session_state.setdefault('layout_cache', {})
+    key = (stock_width, stock_height, panel_specs)
+    if key not in cache:
+        if len(cache) >= 64:
+            cache.pop(next(iter(cache)))
+        cache[key] = optimize_layout(stock_width, stock_height,
+                                     [Panel(w, h, q) for w, h, q in panel_specs],
+                                     progress_callback)
+    return cache[key]
+
+# Reruns with unchanged sheets reuse earlier renders
+@st.cache_data(max_entries=64, hash_funcs={StockSheet: StockSheet.signature})
+def render_layout(sheets):
+    return visualize_layout(sheets)
+
 st.title("Panel Cut Optimizer")
 st.markdown("""
 This tool helps you optimize the arrangement of rectangular panels on stock sheets to minimize waste.
@@ -15,9 +41,9 @@ Enter the stock sheet dimensions and the panels you need to cut below.
 # Stock sheet dimensions
 col1, col2 = st.columns(2)
 with col1:
-    stock_width = st.number_input("Stock Sheet Width", min_value=1.0, value=1650.0, step=0.1)
+    stock_width = st.number_input("Stock Sheet Width", min_value=1.0, value=1650.0, step=0.1, format="%.1f")
 with col2:
-    stock_height = st.number_input("Stock Sheet Height", min_value=1.0, value=2140.0, step=0.1)
+    stock_height = st.number_input("Stock Sheet Height", min_value=1.0, value=2140.0, step=0.1, format="%.1f")
 
 # Panel input section
 st.subheader("Panel Specifications")
@@ -44,12 +70,14 @@ for i, panel in enumerate(st.session_state.panels):
                                        min_value=0.1, 
                                        value=float(panel['width']), 
                                        step=0.1,
+                                       format="%.1f",
                                        key=f"width_{i}")
     with col2:
         panel['height'] = st.number_input(f"Panel {i+1} Height", 
                                         min_value=0.1, 
                                         value=float(panel['height']), 
                                         step=0.1,
+                                        format="%.1f",
                                         key=f"height_{i}")
     with col3:
         panel['quantity'] = st.number_input(f"Quantity", 
@@ -67,63 +95,57 @@ if to_remove is not None:
     st.session_state.panels.pop(to_remove)
     st.rerun()
 
-# Convert input to Panel objects
-panels = [Panel(p['width'], p['height'], p['quantity']) for p in st.session_state.panels]
+# Convert input to Panel objects; the layout works in integer units of the 0.1 input step
+sheet_width = to_units(stock_width)
+sheet_height = to_units(stock_height)
+panels = [Panel(to_units(p['width']), to_units(p['height']), p['quantity']) for p in st.session_state.panels]
 
 # Validate input
 def validate_input(stock_width, stock_height, panels):
     for panel in panels:
+        size = f"{from_units(panel.width)}x{from_units(panel.height)}"
         if panel.width > stock_width and panel.height > stock_width:
-            return False, f"Panel size {panel.width}x{panel.height} is too large for stock width {stock_width}"
+            return False, f"Panel size {size} is too large for stock width {from_units(stock_width)}"
         if panel.height > stock_height and panel.width > stock_height:
-            return False, f"Panel size {panel.width}x{panel.height} is too large for stock height {stock_height}"
+            return False, f"Panel size {size} is too large for stock height {from_units(stock_height)}"
     return True, ""
 
-# Calculate total area for progress estimation
-def calculate_total_area(panels):
-    return sum(p.width * p.height * p.quantity for p in panels)
-
 # Optimize button
 if st.button("Optimize Layout"):
     try:
         # Validate input
-        is_valid, error_message = validate_input(stock_width, stock_height, panels)
+        is_valid, error_message = validate_input(sheet_width, sheet_height, panels)
         if not is_valid:
             st.error(error_message)
         else:
-            # Create progress bar and status
-            progress_bar = st.progress(0)
+            # Progress placeholders stay empty unless the run takes a noticeable
+            # time, then refresh at most every 0.1s since each update is a
+            # round trip to the browser
+            progress_bar = st.empty()
             status_text = st.empty()
-
-            # Calculate total panel area for progress estimation
-            total_area = calculate_total_area(panels)
-
-            # Initialize calculation steps with more detail
-            steps = [
-                'Initializing optimization...',
-                'Analyzing panel dimensions...',
-                'Calculating optimal positions...',
-                'Minimizing material waste...',
-                'Generating visual layout...'
-            ]
-
-            for idx, step in enumerate(steps):
-                status_text.text(f"Step {idx + 1}/{len(steps)}: {step}")
-                progress_bar.progress((idx + 1) / len(steps))
-
-                # Add small delay for visual feedback
-                time.sleep(0.2)
-
-                if idx == 2:  # During position calculation
-                    sheets = optimize_layout(stock_width, stock_height, panels)
+            next_update = {'at': time.perf_counter() + 0.05}
+
+            def report_progress(fraction, message):
+                now = time.perf_counter()
+                if now < next_update['at']:
+                    return
+                next_update['at'] = now + 0.1
+                progress_bar.progress(fraction)
+                status_text.text(message)
+
+            sheets = run_optimization(
+                sheet_width, sheet_height,
+                tuple((p.width, p.height, p.quantity) for p in panels),
+                report_progress
+            )
 
             # Display results
             st.subheader("Optimization Results")
 
             # Summary metrics
-            total_area = stock_width * stock_height * len(sheets)
-            used_area = sum(sum(space['w'] * space['h'] for space in sheet.used_space) 
-                          for sheet in sheets)
+            total_area = sheet_width * sheet_height * len(sheets)
+            used_area = sum(int(np.dot(sheet.used_xywh[:, 2], sheet.used_xywh[:, 3]))
+                            for sheet in sheets)
             total_efficiency = (used_area / total_area) * 100
 
             # Display metrics in columns
@@ -161,20 +183,23 @@ if st.button("Optimize Layout"):
             current_sheet = sheets[st.session_state.current_sheet]
             st.markdown(f"**Sheet {st.session_state.current_sheet + 1}** - Efficiency: {current_sheet.efficiency:.1f}%")
 
+            # Render the current sheet once for both its export and the inline view
+            svg_current = render_layout([current_sheet])
+
             # Export buttons
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Export Current Sheet as SVG"):
-                    svg_string = visualize_layout([current_sheet])
                     st.download_button(
                         label="Download SVG",
-                        data=svg_string,
+                        data=svg_current,
                         file_name=f"cutting_layout_sheet_{st.session_state.current_sheet + 1}.svg",
                         mime="image/svg+xml"
                     )
             with col2:
                 if st.button("Export All Sheets as SVG"):
-                    svg_string = visualize_layout(sheets)
+                    # Only rendered on request
+                    svg_string = render_layout(sheets)
                     st.download_button(
                         label="Download SVG",
                         data=svg_string,
@@ -183,8 +208,7 @@ if st.button("Optimize Layout"):
                     )
 
             # Display visualization
-            svg_string = visualize_layout([current_sheet])
-            st.markdown(f'<div style="text-align: center">{svg_string}</div>', unsafe_allow_html=True)
+            st.markdown(f'<div style="text-align: center">{svg_current}</div>', unsafe_allow_html=True)
 
             # Clear progress indicators
             progress_bar.empty()
@@ -1,167 +1,314 @@
 import numpy as np
-from typing import List, Tuple, Dict
+from collections import deque
+from typing import Callable, List, Tuple, Dict
+
+try:
+    from numba import njit
+except ImportError:  # Fall back to plain Python when numba is unavailable
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# Dimensions are entered in steps of 0.1, so all layout math works on integer
+# multiples of that step
+COORD_SCALE = 10
+
+def to_units(value: float) -> int:
+    """Quantize a dimension to integer layout units."""
+    return round(value * COORD_SCALE)
+
+def from_units(units: int) -> float:
+    """Convert integer layout units back to a dimension."""
+    return units / COORD_SCALE
 
 class Panel:
-    def __init__(self, width: float, height: float, quantity: int):
+    def __init__(self, width: int, height: int, quantity: int):
         self.width = width
         self.height = height
         self.quantity = quantity
-        self.position: Tuple[float, float] | None = None
-        self.rotated = False
 
 class StockSheet:
-    def __init__(self, width: float, height: float):
+    def __init__(self, width: int, height: int, panels: List['Panel'] | None = None):
         self.width = width
         self.height = height
-        self.used_space = []
+        # Panels referenced by index from the placement records
+        self.panels = panels if panels is not None else []
         self.efficiency = 0.0
+        # Placements as parallel arrays: rows of (x, y, w, h), the index of the
+        # placed panel and its orientation; capacity doubles when full
+        self._xywh = np.empty((16, 4), dtype=np.int64)
+        self._panel_idx = np.empty(16, dtype=np.int32)
+        self._rotated = np.empty(16, dtype=np.bool_)
+        self._n = 0
+        # Maximal free rectangles as rows of (x, y, w, h)
+        self._free = np.array([[0, 0, width, height]], dtype=np.int64)
+        # Cheap upper bounds for ruling the sheet out before a full search
+        self.free_area = width * height
+        self.max_free_side = max(width, height)
 
-def find_position(sheet: StockSheet, panel: Panel) -> Tuple[bool, float, float, bool]:
-    """Find the best position for a panel on the sheet using optimized algorithm."""
-    best_x = float('inf')
-    best_y = float('inf')
+    @property
+    def used_xywh(self) -> np.ndarray:
+        """View of the placed rectangles as an (n, 4) array of x, y, w, h."""
+        return self._xywh[:self._n]
+
+    @property
+    def used_rotated(self) -> np.ndarray:
+        """View of the orientation flag of each placed rectangle."""
+        return self._rotated[:self._n]
+
+    @property
+    def used_space(self) -> List[Dict]:
+        """Placed panels as dicts with x, y, w, h, panel and rotated keys."""
+        return [
+            {'x': x, 'y': y, 'w': w, 'h': h, 'panel': self.panels[idx], 'rotated': rotated}
+            for (x, y, w, h), idx, rotated in zip(
+                self.used_xywh.tolist(), self._panel_idx[:self._n].tolist(), self.used_rotated.tolist()
+            )
+        ]
+
+    @property
+    def free_rects(self) -> List[Tuple[int, int, int, int]]:
+        """Maximal free rectangles as (x, y, w, h) tuples."""
+        return [tuple(rect) for rect in self._free.tolist()]
+
+    def signature(self) -> tuple:
+        """Hashable summary of everything that affects how the sheet is drawn."""
+        return (self.width, self.height, self.efficiency,
+                self.used_xywh.tobytes(), self.used_rotated.tobytes())
+
+    def add_panel(self, x: int, y: int, w: int, h: int, panel_idx: int, rotated: bool = False):
+        """Record panels[panel_idx] placed at (x, y) with the given footprint."""
+        if self._n == len(self._xywh):
+            capacity = 2 * len(self._xywh)
+            xywh = np.empty((capacity, 4), dtype=np.int64)
+            xywh[:self._n] = self._xywh
+            self._xywh = xywh
+            self._panel_idx = np.resize(self._panel_idx, capacity)
+            self._rotated = np.resize(self._rotated, capacity)
+        self._xywh[self._n] = (x, y, w, h)
+        self._panel_idx[self._n] = panel_idx
+        self._rotated[self._n] = rotated
+        self._n += 1
+        self._free = _split_free_rects(self._free, x, y, w, h)
+        self.free_area -= w * h
+        self.max_free_side = int(self._free[:, 2:4].max()) if len(self._free) else 0
+
+@njit(cache=True)
+def _find_position_kernel(free_xywh, panel_w, panel_h):
+    """Best Short-Side Fit over the free rectangles; returns (can_place, x, y, rotated).
+
+    Free rectangles are sorted bottom-left first, so the first of equally
+    scored fits is the bottom-left one and an exact fit ends the search.
+    """
+    best_short = 0
+    best_long = 0
+    best_x = 0
+    best_y = 0
     can_place = False
     best_rotated = False
 
-    # Calculate step size based on panel dimensions (0.1% of smallest dimension)
-    step = min(panel.width, panel.height, sheet.width, sheet.height) * 0.001
+    n_orientations = 2 if panel_w != panel_h else 1
+    for i in range(free_xywh.shape[0]):
+        fx = free_xywh[i, 0]
+        fy = free_xywh[i, 1]
+        fw = free_xywh[i, 2]
+        fh = free_xywh[i, 3]
+        for k in range(n_orientations):
+            rotated = k == 1
+            w = panel_h if rotated else panel_w
+            h = panel_w if rotated else panel_h
+            if w > fw or h > fh:
+                continue
 
-    # Try both orientations
-    orientations = [(panel.width, panel.height, False)]
-    if panel.width != panel.height:
-        orientations.append((panel.height, panel.width, True))
+            # Score by leftover on the short side, then the long side
+            short = min(fw - w, fh - h)
+            long = max(fw - w, fh - h)
+            if short == 0 and long == 0:
+                return True, fx, fy, rotated
+            if not can_place or short < best_short or (short == best_short and long < best_long):
+                best_short = short
+                best_long = long
+                best_x = fx
+                best_y = fy
+                can_place = True
+                best_rotated = rotated
 
-    # Sort orientations to prefer the one that better fits the available space
-    orientations.sort(key=lambda x: (
-        -(x[0] if x[0] <= sheet.width else 0),  # Prefer wider pieces along width
-        -(x[1] if x[1] <= sheet.height else 0)  # Prefer taller pieces along height
-    ))
+    return can_place, best_x, best_y, best_rotated
+
+@njit(cache=True)
+def _split_free_rects(free_xywh, x, y, w, h):
+    """Carve the placed rectangle out of the free rectangles and drop non-maximal ones."""
+    n = free_xywh.shape[0]
+    out = np.empty((4 * n, 4), dtype=np.int64)
+    pieces = np.empty((4 * n, 4), dtype=np.int64)
+    m = 0
+    p = 0
+    for i in range(n):
+        fx = free_xywh[i, 0]
+        fy = free_xywh[i, 1]
+        fw = free_xywh[i, 2]
+        fh = free_xywh[i, 3]
 
-    for w, h, rotated in orientations:
-        # Skip if panel doesn't fit in this orientation
-        if w > sheet.width or h > sheet.height:
+        # Untouched rectangles survive as they are
+        if x >= fx + fw or x + w <= fx or y >= fy + fh or y + h <= fy:
+            out[m, 0] = fx
+            out[m, 1] = fy
+            out[m, 2] = fw
+            out[m, 3] = fh
+            m += 1
             continue
 
-        # First try corners and edges
-        priority_positions = [
-            (0, 0),  # Bottom-left corner
-            (sheet.width - w, 0),  # Bottom-right corner
-            (0, sheet.height - h),  # Top-left corner
-            (sheet.width - w, sheet.height - h),  # Top-right corner
-        ]
+        # Up to four maximal pieces: left, right, below and above the panel
+        if x > fx:
+            pieces[p, 0] = fx
+            pieces[p, 1] = fy
+            pieces[p, 2] = x - fx
+            pieces[p, 3] = fh
+            p += 1
+        if x + w < fx + fw:
+            pieces[p, 0] = x + w
+            pieces[p, 1] = fy
+            pieces[p, 2] = fx + fw - (x + w)
+            pieces[p, 3] = fh
+            p += 1
+        if y > fy:
+            pieces[p, 0] = fx
+            pieces[p, 1] = fy
+            pieces[p, 2] = fw
+            pieces[p, 3] = y - fy
+            p += 1
+        if y + h < fy + fh:
+            pieces[p, 0] = fx
+            pieces[p, 1] = y + h
+            pieces[p, 2] = fw
+            pieces[p, 3] = fy + fh - (y + h)
+            p += 1
 
-        # Add positions next to existing panels
-        for used in sheet.used_space:
-            priority_positions.extend([
-                (used['x'] + used['w'], used['y']),  # Right side
-                (used['x'], used['y'] + used['h']),  # Top side
-            ])
-
-        # Filter valid priority positions
-        priority_positions = [
-            (x, y) for x, y in priority_positions
-            if 0 <= x <= sheet.width - w and 0 <= y <= sheet.height - h
-        ]
+    # Untouched rectangles were already maximal and each piece lies inside its
+    # split parent, so only pieces can be redundant: drop those contained in an
+    # untouched rectangle or in another piece (which also collapses duplicates)
+    n_untouched = m
+    for i in range(p):
+        contained = False
+        for j in range(n_untouched + p):
+            if j < n_untouched:
+                ox = out[j, 0]
+                oy = out[j, 1]
+                ow = out[j, 2]
+                oh = out[j, 3]
+            else:
+                k = j - n_untouched
+                if k == i or pieces[k, 2] < 0:
+                    continue
+                ox = pieces[k, 0]
+                oy = pieces[k, 1]
+                ow = pieces[k, 2]
+                oh = pieces[k, 3]
+            if (pieces[i, 0] >= ox and pieces[i, 1] >= oy and
+                    pieces[i, 0] + pieces[i, 2] <= ox + ow and
+                    pieces[i, 1] + pieces[i, 3] <= oy + oh):
+                contained = True
+                break
+        if contained:
+            # Mark as dropped so later pieces don't test against it
+            pieces[i, 2] = -1
+        else:
+            out[m] = pieces[i]
+            m += 1
 
-        # Check priority positions first
-        for x, y in priority_positions:
-            valid = True
-            for used in sheet.used_space:
-                if not (x + w <= used['x'] or x >= used['x'] + used['w'] or
-                       y + h <= used['y'] or y >= used['y'] + used['h']):
-                    valid = False
-                    break
-
-            if valid:
-                if not can_place or (y < best_y or (y == best_y and x < best_x)):
-                    best_x = x
-                    best_y = y
-                    can_place = True
-                    best_rotated = rotated
-
-        # If no priority position works, try regular positions with optimized step size
-        if not can_place:
-            for x in np.arange(0, sheet.width - w + step, step):
-                for y in np.arange(0, sheet.height - h + step, step):
-                    valid = True
-                    for used in sheet.used_space:
-                        if not (x + w <= used['x'] or x >= used['x'] + used['w'] or
-                               y + h <= used['y'] or y >= used['y'] + used['h']):
-                            valid = False
-                            break
-
-                    if valid:
-                        if not can_place or (y < best_y or (y == best_y and x < best_x)):
-                            best_x = x
-                            best_y = y
-                            can_place = True
-                            best_rotated = rotated
+    out = out[:m]
 
-    return can_place, best_x, best_y, best_rotated
+    # Keep rectangles in bottom-left order (by y, then x) for the position search
+    order = np.argsort(out[:, 0], kind='mergesort')
+    order = order[np.argsort(out[order, 1], kind='mergesort')]
+    return out[order]
+
+def find_position(sheet: StockSheet, panel: Panel) -> Tuple[bool, int, int, bool]:
+    """Find the best position for a panel on the sheet using the MaxRects algorithm."""
+    can_place, x, y, rotated = _find_position_kernel(
+        sheet._free, int(panel.width), int(panel.height)
+    )
+    return bool(can_place), int(x), int(y), bool(rotated)
+
+def warm_up():
+    """Compile the placement kernel ahead of the first real optimization."""
+    sheet = StockSheet(2, 2, [Panel(1, 1, 1)])
+    sheet.add_panel(0, 0, 1, 1, 0)
+    find_position(sheet, Panel(1, 2, 1))
 
-def optimize_layout(stock_width: float, stock_height: float, panels: List[Panel]) -> List[StockSheet]:
-    """Optimize the layout of panels on stock sheets."""
-    # Create copies of panels and sort by area and longer dimension
-    panels_copy = []
-    for panel in panels:
-        for _ in range(panel.quantity):
-            panels_copy.append(Panel(panel.width, panel.height, 1))
-
-    # Sort panels by longer dimension first
-    panels_copy.sort(key=lambda p: (
-        -max(p.width, p.height),  # Longer dimension first
-        -(p.width * p.height),    # Then by area
-        -min(p.width, p.height)   # Finally by shorter dimension
+def optimize_layout(stock_width: int, stock_height: int, panels: List[Panel],
+                    progress_callback: Callable[[float, str], None] | None = None) -> List[StockSheet]:
+    """Optimize the layout of panels on stock sheets.
+
+    All dimensions are integer layout units (see to_units).
+    If given, progress_callback is called after every placement with the
+    fraction of panels placed so far and a status message.
+    """
+    # Panels sorted once, each with its remaining quantity; identical units
+    # share one entry instead of being expanded into separate copies
+    panels = list(panels)
+    order = sorted(range(len(panels)), key=lambda i: (
+        -max(panels[i].width, panels[i].height),  # Longer dimension first
+        -(panels[i].width * panels[i].height),    # Then by area
+        -min(panels[i].width, panels[i].height)   # Finally by shorter dimension
     ))
+    remaining_panels = deque([i, panels[i].quantity] for i in order if panels[i].quantity > 0)
 
-    sheets = [StockSheet(stock_width, stock_height)]
-    remaining_panels = panels_copy
+    sheets = [StockSheet(stock_width, stock_height, panels)]
+    total_count = sum(qty for _, qty in remaining_panels)
+    placed_count = 0
 
     while remaining_panels:
-        panel = remaining_panels[0]
+        entry = remaining_panels[0]
+        panel_idx = entry[0]
+        panel = panels[panel_idx]
         placed = False
 
-        # Try to place panel on existing sheets
+        panel_area = panel.width * panel.height
+        panel_long = max(panel.width, panel.height)
+
+        # Try to place panel on existing sheets, skipping those that clearly
+        # lack the room
         for sheet in sheets:
+            if sheet.free_area < panel_area or sheet.max_free_side < panel_long:
+                continue
             can_place, x, y, rotated = find_position(sheet, panel)
             if can_place:
                 w = panel.height if rotated else panel.width
                 h = panel.width if rotated else panel.height
-                sheet.used_space.append({
-                    'x': x, 'y': y, 'w': w, 'h': h, 
-                    'panel': panel
-                })
-                panel.position = (x, y)
-                panel.rotated = rotated
-                panel.quantity -= 1
+                sheet.add_panel(x, y, w, h, panel_idx, rotated)
                 placed = True
                 break
 
         # If panel couldn't be placed, create new sheet
         if not placed:
-            new_sheet = StockSheet(stock_width, stock_height)
+            new_sheet = StockSheet(stock_width, stock_height, panels)
             can_place, x, y, rotated = find_position(new_sheet, panel)
             if can_place:
                 w = panel.height if rotated else panel.width
                 h = panel.width if rotated else panel.height
-                new_sheet.used_space.append({
-                    'x': x, 'y': y, 'w': w, 'h': h, 
-                    'panel': panel
-                })
-                panel.position = (x, y)
-                panel.rotated = rotated
-                panel.quantity -= 1
+                new_sheet.add_panel(x, y, w, h, panel_idx, rotated)
                 sheets.append(new_sheet)
             else:
-                raise ValueError(f"Panel {panel.width}x{panel.height} is too large for stock sheet {stock_width}x{stock_height}")
+                raise ValueError(
+                    f"Panel {from_units(panel.width)}x{from_units(panel.height)} is too large for "
+                    f"stock sheet {from_units(stock_width)}x{from_units(stock_height)}"
+                )
+
+        placed_count += 1
+        if progress_callback is not None:
+            progress_callback(placed_count / total_count, f"Placing panel {placed_count}/{total_count}")
 
         # Remove panel if all quantities placed
-        if panel.quantity == 0:
-            remaining_panels.pop(0)
+        entry[1] -= 1
+        if entry[1] == 0:
+            remaining_panels.popleft()
 
     # Calculate efficiency for each sheet
     for sheet in sheets:
-        used_area = sum(space['w'] * space['h'] for space in sheet.used_space)
+        used = sheet.used_xywh
+        used_area = int(np.dot(used[:, 2], used[:, 3]))
         sheet.efficiency = (used_area / (sheet.width * sheet.height)) * 100
 
     return sheets
\ No newline at end of file
@@ -0,0 +1,70 @@
+import random
+
+import pytest
+
+from optimizer import Panel, optimize_layout
+
+
+def overlaps(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return not (ax + aw <= bx or bx + bw <= ax or ay + ah <= by or by + bh <= ay)
+
+
+def contains(outer, inner):
+    ox, oy, ow, oh = outer
+    ix, iy, iw, ih = inner
+    return ix >= ox and iy >= oy and ix + iw <= ox + ow and iy + ih <= oy + oh
+
+
+def random_case(seed):
+    rng = random.Random(seed)
+    width, height = rng.choice([(1000, 1000), (16500, 21400), (500, 800)])
+    panels = [
+        Panel(rng.randint(30, width // 2), rng.randint(30, height // 2), rng.randint(1, 6))
+        for _ in range(rng.randint(1, 12))
+    ]
+    return width, height, panels
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_layout_invariants(seed):
+    width, height, panels = random_case(seed)
+    sheets = optimize_layout(width, height, panels)
+
+    assert sum(len(sheet.used_xywh) for sheet in sheets) == sum(p.quantity for p in panels)
+    for sheet in sheets:
+        placed = [tuple(rect) for rect in sheet.used_xywh.tolist()]
+        free = sheet.free_rects
+
+        # Every panel lies on the sheet and no two panels overlap
+        for i, rect in enumerate(placed):
+            assert contains((0, 0, width, height), rect)
+            for other in placed[i + 1:]:
+                assert not overlaps(rect, other)
+
+        # Free rectangles lie on the sheet, avoid every panel and are maximal
+        for i, rect in enumerate(free):
+            assert contains((0, 0, width, height), rect)
+            assert not any(overlaps(rect, used) for used in placed)
+            assert not any(contains(other, rect) for j, other in enumerate(free) if j != i)
+
+
+def test_exact_fit_fills_one_sheet():
+    sheets = optimize_layout(100, 100, [Panel(50, 50, 4)])
+
+    assert len(sheets) == 1
+    assert sheets[0].efficiency == 100.0
+    assert sheets[0].free_rects == []
+
+
+def test_rotates_panel_to_fit():
+    sheets = optimize_layout(100, 50, [Panel(50, 100, 1)])
+
+    assert len(sheets) == 1
+    assert sheets[0].used_rotated.tolist() == [True]
+
+
+def test_panel_too_large_raises():
+    with pytest.raises(ValueError):
+        optimize_layout(100, 100, [Panel(150, 150, 1)])
@@ -1,63 +1,176 @@
+import functools
+import threading
+import matplotlib
 import matplotlib.pyplot as plt
 import numpy as np
-from optimizer import StockSheet
-from typing import List
+from matplotlib.figure import Figure
+from optimizer import StockSheet, from_units
+from typing import Dict, List, Tuple
 import io
 import base64
 
-def generate_colors(n: int) -> List[str]:
+# Figures reused across renders, keyed by number of sheets; the lock keeps
+# concurrent Streamlit sessions from drawing into the same figure
+_fig_cache: Dict[int, Figure] = {}
+_fig_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=32)
+def generate_colors(n: int) -> np.ndarray:
     """Generate n distinct colors for visualization."""
-    return plt.cm.get_cmap('tab20')(np.linspace(0, 1, max(n, 1)))
+    return matplotlib.colormaps['tab20'](np.linspace(0, 1, max(n, 1)))
+
+def _size_indices(sheets: List[StockSheet]) -> Tuple[int, List[np.ndarray]]:
+    """Number the distinct (w, h) panel sizes across all sheets.
+
+    Returns the number of sizes and, per sheet, the size index of each placement.
+    """
+    all_wh = np.concatenate([sheet.used_xywh[:, 2:4] for sheet in sheets])
+    uniq, inv = np.unique(all_wh, axis=0, return_inverse=True)
+    bounds = np.cumsum([len(sheet.used_xywh) for sheet in sheets])[:-1]
+    return len(uniq), np.split(inv.reshape(-1), bounds)
+
+# Matplotlib's tab20 palette, inlined so the SVG path never touches matplotlib
+PALETTE = [
+    '#1f77b4', '#aec7e8', '#ff7f0e', '#ffbb78', '#2ca02c',
+    '#98df8a', '#d62728', '#ff9896', '#9467bd', '#c5b0d5',
+    '#8c564b', '#c49c94', '#e377c2', '#f7b6d2', '#7f7f7f',
+    '#c7c7c7', '#bcbd22', '#dbdb8d', '#17becf', '#9edae5',
+]
+
+def visualize_layout(sheets: List[StockSheet], use_mpl: bool = False) -> str:
+    """Create a visualization of the panel layout and return it as an SVG string.
+
+    The SVG is emitted directly; pass use_mpl=True to render through matplotlib
+    instead, which is slower but handy for debugging.
+    """
+    if use_mpl:
+        return _visualize_layout_mpl(sheets)
+
+    _, size_indices = _size_indices(sheets)
+
+    pad = 0.02 * max(max(sheet.width, sheet.height) for sheet in sheets)
+    title_h = 6 * pad
+    total_w = sum(sheet.width + 2 * pad for sheet in sheets)
+    total_h = max(sheet.height for sheet in sheets) + 2 * pad + title_h
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {total_w} {total_h}" '
+        f'width="{432 * len(sheets)}pt" height="{432 * len(sheets) * total_h / total_w}pt">'
+    ]
+    ox = 0.0
+    for idx, (sheet, sizes) in enumerate(zip(sheets, size_indices)):
+        left = ox + pad
+        top = title_h + pad
+        font = 2 * pad
+
+        # Title
+        parts.append(
+            f'<text x="{left + sheet.width / 2}" y="{title_h / 2}" font-size="{font}" '
+            f'text-anchor="middle">Sheet {idx+1}</text>'
+            f'<text x="{left + sheet.width / 2}" y="{title_h / 2 + 1.2 * font}" font-size="{font}" '
+            f'text-anchor="middle">Efficiency: {sheet.efficiency:.1f}%</text>'
+        )
 
-def visualize_layout(sheets: List[StockSheet]) -> str:
-    """Create a visualization of the panel layout and return as base64 encoded SVG."""
+        # Draw stock sheet boundary
+        parts.append(
+            f'<rect x="{left}" y="{top}" width="{sheet.width}" height="{sheet.height}" '
+            f'fill="none" stroke="black" stroke-width="2" vector-effect="non-scaling-stroke"/>'
+        )
+
+        # Draw panels; SVG's y axis points down, so flip against the sheet top
+        for (px, py, w, h), rotated, size in zip(sheet.used_xywh.tolist(), sheet.used_rotated.tolist(),
+                                                 sizes.tolist()):
+            x = left + px
+            y = top + sheet.height - py - h
+            color = PALETTE[size % len(PALETTE)]
+            parts.append(
+                f'<rect x="{x}" y="{y}" width="{w}" height="{h}" '
+                f'fill="{color}" fill-opacity="0.5"/>'
+            )
+
+            # Add dimensions text
+            cx = x + w / 2
+            cy = y + h / 2
+            label = f"{from_units(w)}x{from_units(h)}"
+            if rotated:
+                label += f'<tspan x="{cx}" dy="1.2em">R</tspan>'
+            parts.append(
+                f'<text x="{cx}" y="{cy}" font-size="{font / 2}" text-anchor="middle" '
+                f'dominant-baseline="middle">{label}</text>'
+            )
+
+            # Draw cut lines along the bottom and left edges
+            bottom = y + h
+            parts.append(
+                f'<line x1="{x}" y1="{bottom}" x2="{x + w}" y2="{bottom}" '
+                f'stroke="black" stroke-opacity="0.5" stroke-dasharray="4 2" '
+                f'vector-effect="non-scaling-stroke"/>'
+                f'<line x1="{x}" y1="{y}" x2="{x}" y2="{bottom}" '
+                f'stroke="black" stroke-opacity="0.5" stroke-dasharray="4 2" '
+                f'vector-effect="non-scaling-stroke"/>'
+            )
+
+        ox += sheet.width + 2 * pad
+
+    parts.append('</svg>')
+    return ''.join(parts)
+
+def _visualize_layout_mpl(sheets: List[StockSheet]) -> str:
+    """Render the panel layout through matplotlib and return it as an SVG string."""
+    with _fig_lock:
+        return _render_mpl(sheets)
+
+def _render_mpl(sheets: List[StockSheet]) -> str:
+    """Draw into the cached figure for this sheet count; caller holds _fig_lock."""
     n_sheets = len(sheets)
-    fig, axs = plt.subplots(1, n_sheets, figsize=(6*n_sheets, 6))
-    if n_sheets == 1:
-        axs = [axs]
+    fig = _fig_cache.get(n_sheets)
+    if fig is None:
+        fig = Figure(figsize=(6*n_sheets, 6))
+        fig.subplots(1, n_sheets)
+        _fig_cache[n_sheets] = fig
+    axs = fig.axes
+    for ax in axs:
+        ax.clear()
 
     # Generate unique colors for different panel sizes
-    unique_sizes = set()
-    for sheet in sheets:
-        for space in sheet.used_space:
-            unique_sizes.add((space['w'], space['h']))
-    colors = dict(zip(unique_sizes, generate_colors(len(unique_sizes))))
+    n_sizes, size_indices = _size_indices(sheets)
+    colors = generate_colors(n_sizes)
+
+    for idx, (sheet, ax, sizes) in enumerate(zip(sheets, axs, size_indices)):
+        sheet_w = from_units(sheet.width)
+        sheet_h = from_units(sheet.height)
 
-    for idx, (sheet, ax) in enumerate(zip(sheets, axs)):
         # Draw stock sheet boundary
-        ax.add_patch(plt.Rectangle((0, 0), sheet.width, sheet.height, 
+        ax.add_patch(plt.Rectangle((0, 0), sheet_w, sheet_h, 
                                  fill=False, color='black', linewidth=2))
 
         # Draw panels
-        for space in sheet.used_space:
-            color = colors[(space['w'], space['h'])]
+        for space, size in zip(sheet.used_space, sizes):
+            color = colors[size]
+            x, y, w, h = (from_units(space[k]) for k in ('x', 'y', 'w', 'h'))
             # Draw panel
-            rect = plt.Rectangle((space['x'], space['y']), 
-                               space['w'], space['h'],
+            rect = plt.Rectangle((x, y), w, h,
                                fill=True, alpha=0.5, color=color)
             ax.add_patch(rect)
 
             # Add dimensions text
-            ax.text(space['x'] + space['w']/2, space['y'] + space['h']/2,
-                   f"{space['w']}x{space['h']}\n{'R' if space['panel'].rotated else ''}", 
+            ax.text(x + w/2, y + h/2,
+                   f"{w}x{h}\n{'R' if space['rotated'] else ''}", 
                    ha='center', va='center', fontsize=8)
 
             # Draw cut lines
-            ax.plot([space['x'], space['x'] + space['w']], 
-                   [space['y'], space['y']], 'k--', alpha=0.5)
-            ax.plot([space['x'], space['x']], 
-                   [space['y'], space['y'] + space['h']], 'k--', alpha=0.5)
+            ax.plot([x, x + w], [y, y], 'k--', alpha=0.5)
+            ax.plot([x, x], [y, y + h], 'k--', alpha=0.5)
 
-        ax.set_xlim(-1, sheet.width + 1)
-        ax.set_ylim(-1, sheet.height + 1)
+        ax.set_xlim(-1, sheet_w + 1)
+        ax.set_ylim(-1, sheet_h + 1)
         ax.set_aspect('equal')
         ax.grid(True, linestyle='--', alpha=0.3)
         ax.set_title(f"Sheet {idx+1}\nEfficiency: {sheet.efficiency:.1f}%")
 
     # Save plot to bytes buffer as SVG
     buf = io.BytesIO()
-    plt.savefig(buf, format='svg', bbox_inches='tight')
-    plt.close()
+    fig.savefig(buf, format='svg', bbox_inches='tight')
 
     # Convert to base64 string
     buf.seek(0)